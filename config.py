@@ -21,6 +21,8 @@ class Config:
     hours_window: int = 24
     filter_name: str = "tutor"
     limit: int = 100
+    # Time-window slices fetched concurrently; 1 keeps the serial fetch
+    parallel_shards: int = 1
     
     # S3 settings
     s3_bucket_name: str = ""
@@ -30,6 +32,7 @@ class Config:
     mongo_connection_string: str = ""
     mongo_database_name: str = ""
     mongo_collection_name: str = ""
+    mongo_ensure_index: bool = True
     
     # Output settings
     output_dir: str = "langsmith-exports"
@@ -40,11 +43,14 @@ class Config:
     @classmethod
     def from_env(cls) -> "Config":
         """Create configuration from environment variables."""
-        api_key = os.getenv("LANGSMITH_API_KEY", "").strip()
+        # Snapshot the environment once instead of going through os.getenv per field
+        get = os.environ.copy().get
+        
+        api_key = get("LANGSMITH_API_KEY", "").strip()
         if not api_key:
             raise ValueError("LANGSMITH_API_KEY is required")
         
-        session_ids_env = os.getenv(
+        session_ids_env = get(
             "LS_SESSION_IDS", "8aa48f29-844f-40cf-8062-301e9fc4f500"
         ).strip()
         session_ids = [s.strip() for s in session_ids_env.split(",") if s.strip()]
@@ -52,12 +58,14 @@ class Config:
         return cls(
             langsmith_api_key=api_key,
             session_ids=session_ids,
-            hours_window=int(os.getenv("LS_HOURS_WINDOW", "24")),
-            filter_name=os.getenv("LS_FILTER_NAME", "tutor").strip(),
-            s3_bucket_name=os.getenv("S3_BUCKET_NAME", "").strip(),
-            aws_region=os.getenv("AWS_REGION", "us-east-1").strip(),
-            mongo_connection_string=os.getenv("MONGO_CONNECTION_STRING", "").strip(),
-            mongo_database_name=os.getenv("MONGO_DATABASE_NAME", "").strip(),
-            mongo_collection_name=os.getenv("MONGO_COLLECTION_NAME", "").strip(),
-            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            hours_window=int(get("LS_HOURS_WINDOW", "24")),
+            filter_name=get("LS_FILTER_NAME", "tutor").strip(),
+            parallel_shards=int(get("LS_PARALLEL_SHARDS", "1")),
+            s3_bucket_name=get("S3_BUCKET_NAME", "").strip(),
+            aws_region=get("AWS_REGION", "us-east-1").strip(),
+            mongo_connection_string=get("MONGO_CONNECTION_STRING", "").strip(),
+            mongo_database_name=get("MONGO_DATABASE_NAME", "").strip(),
+            mongo_collection_name=get("MONGO_COLLECTION_NAME", "").strip(),
+            mongo_ensure_index=get("MONGO_ENSURE_INDEX", "true").strip().lower() not in ("0", "false", "no"),
+            log_level=get("LOG_LEVEL", "INFO").upper(),
         )
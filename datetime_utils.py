@@ -0,0 +1,44 @@
+"""ISO 8601 timestamp parsing shared by the export modules."""
+from __future__ import annotations
+
+import sys
+from datetime import datetime
+from typing import Any, Optional
+
+try:
+    from ciso8601 import parse_datetime as _ciso_parse_datetime  # type: ignore
+except ImportError:  # pragma: no cover
+    _ciso_parse_datetime = None  # type: ignore
+
+# datetime.fromisoformat accepts a trailing "Z" natively from Python 3.11
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
+
+def parse_iso_datetime(value: Any) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 timestamp (trailing 'Z' allowed) into a datetime.
+    
+    ciso8601 is tried first when installed; anything it rejects still gets a
+    chance with datetime.fromisoformat.
+    
+    Args:
+        value: Timestamp string; any other value is treated as unparseable
+        
+    Returns:
+        Parsed datetime (naive if the string has no offset), or None if value
+        is not a valid ISO 8601 string
+    """
+    if not isinstance(value, str):
+        return None
+    # ciso8601 parses the fixed YYYY-MM-DDTHH:MM:SS[.ffffff][Z|+HH:MM] shape in C
+    if _ciso_parse_datetime is not None:
+        try:
+            return _ciso_parse_datetime(value)
+        except ValueError:
+            pass
+    try:
+        if not _FROMISO_HANDLES_Z and value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
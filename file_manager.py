@@ -4,14 +4,88 @@ from __future__ import annotations
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except ImportError:  # pragma: no cover
     from backports.zoneinfo import ZoneInfo  # type: ignore
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+# Fields dropped from the summary file (the bulky raw and simplified message payloads)
+SUMMARY_EXCLUDED_FIELDS = frozenset({"outputs", "conversation_json"})
+
+# Write buffer size; elements are streamed as many small writes
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _json_default(obj: Any) -> str:
+    """Encode datetimes for the stdlib json fallback the way orjson does (UTC as Z)."""
+    if isinstance(obj, datetime):
+        iso = obj.isoformat()
+        return iso[:-6] + "Z" if iso.endswith("+00:00") else iso
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any, indent: bool) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, preferring orjson. Compact unless indent."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    
+    # Datetimes are written exactly as the orjson path writes them
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_json_default).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _write_json_array(items: Iterable[Any], file_path: str, indent: bool = True) -> None:
+    """
+    Stream items to file_path as a JSON array, serializing one element at a time.
+    
+    Output matches dumping the whole list at once, but only one element's encoded
+    bytes are held in memory instead of the entire file.
+    """
+    with open(file_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(b"[")
+        first = True
+        for item in items:
+            if first:
+                first = False
+                if indent:
+                    f.write(b"\n  ")
+            else:
+                f.write(b",\n  " if indent else b",")
+            
+            encoded = _dumps(item, indent)
+            if indent:
+                # Nest the element one level deeper; JSON strings never contain raw newlines
+                encoded = encoded.replace(b"\n", b"\n  ")
+            f.write(encoded)
+        
+        if indent and not first:
+            f.write(b"\n")
+        f.write(b"]")
+
+
+def _summarize_run(run: Any) -> Any:
+    """Return a shallow copy of run without the fields excluded from the summary file."""
+    if not isinstance(run, dict):
+        return run
+    
+    summary_run = run.copy()
+    for field_name in SUMMARY_EXCLUDED_FIELDS:
+        summary_run.pop(field_name, None)
+    return summary_run
+
 
 def write_runs_files(runs: List[Dict[str, Any]], output_dir: str) -> tuple[str, str]:
     """
@@ -38,28 +112,26 @@ def write_runs_files(runs: List[Dict[str, Any]], output_dir: str) -> tuple[str,
     summary_file_name = f"{timestamp}-langchain-runs-summary.txt"
     summary_file_path = os.path.join(output_dir, summary_file_name)
     
-    # Full runs keep everything (outputs, conversation_json, conversation_str)
-    full_runs = runs  # Keep all fields including outputs
-    
-    # Create summary runs without outputs and conversation_json fields
-    summary_runs = []
-    for run in runs:
-        if isinstance(run, dict):
-            summary_run = {k: v for k, v in run.items() if k not in ["outputs", "conversation_json"]}
-            summary_runs.append(summary_run)
-        else:
-            summary_runs.append(run)
+    def _write_full() -> str:
+        # Full file (with outputs, conversation_json, and conversation_str), compact
+        # since it is machine-consumed; only the summary is indented for humans
+        _write_json_array(runs, full_file_path, indent=False)
+        return full_file_path
     
-    # Write full file (with outputs, conversation_json, and conversation_str)
-    with open(full_file_path, "w", encoding="utf-8") as f:
-        json.dump(full_runs, f, ensure_ascii=False, indent=2)
+    def _write_summary() -> str:
+        # Summary file, projected lazily per run without outputs and conversation_json
+        _write_json_array((_summarize_run(run) for run in runs), summary_file_path)
+        return summary_file_path
     
-    # Write summary file (without outputs and conversation_json)
-    with open(summary_file_path, "w", encoding="utf-8") as f:
-        json.dump(summary_runs, f, ensure_ascii=False, indent=2)
+    # Overlap serialization of one file with the disk write of the other
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        full_future = executor.submit(_write_full)
+        summary_future = executor.submit(_write_summary)
+        full_future.result()
+        summary_future.result()
     
     logging.info("Wrote %s runs to full file: %s", len(runs), full_file_path)
-    logging.info("Wrote %s runs to summary file: %s", len(summary_runs), summary_file_path)
+    logging.info("Wrote %s runs to summary file: %s", len(runs), summary_file_path)
     
     return full_file_path, summary_file_path
 
@@ -1,26 +1,41 @@
 """LangSmith API client for fetching runs."""
 from __future__ import annotations
 
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except ImportError:  # pragma: no cover
     from backports.zoneinfo import ZoneInfo  # type: ignore
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
 from config import Config
 from data_processor import _parse_iso
-from thread_parser import enrich_run_with_thread_data
+from thread_parser import enrich_runs
 
 LANGSMITH_QUERY_URL = "https://api.smith.langchain.com/api/v1/runs/query"
 
 # Constants
 MAX_RETRIES = 3
+MAX_RETRY_DELAY = 60.0
 REQUEST_TIMEOUT = 60
+CONNECTION_POOL_SIZE = 16
+
+# Exact value types that _clean_empty_fields can keep without further checks
+_NEVER_EMPTY_TYPES = frozenset({int, float, bool})
 
 
 def _to_iso(dt: datetime) -> str:
@@ -30,6 +45,19 @@ def _to_iso(dt: datetime) -> str:
     return dt.astimezone(ZoneInfo("UTC")).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited request, capped at MAX_RETRY_DELAY."""
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = math.nan
+        # Non-finite values ("inf", "nan") are treated like unparseable ones
+        if math.isfinite(delay):
+            return min(max(delay, 0.0), MAX_RETRY_DELAY)
+    return float(min(2 ** attempt, MAX_RETRY_DELAY))
+
+
 class LangSmithClient:
     """Client for interacting with LangSmith API."""
     
@@ -39,23 +67,46 @@ class LangSmithClient:
             "x-api-key": config.langsmith_api_key,
             "Content-Type": "application/json",
         }
+        
+        # Reuse keep-alive connections across pages and shards
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=CONNECTION_POOL_SIZE,
+            pool_maxsize=CONNECTION_POOL_SIZE,
+            max_retries=0,
+        )
+        self.session.mount("https://", adapter)
     
     def _make_api_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Make API request with retry logic for rate limits and errors."""
+        # Serialize once for all attempts; Content-Type is already set on the session
+        body = orjson.dumps(payload) if orjson is not None else None
+        
         for attempt in range(MAX_RETRIES):
             try:
-                resp = requests.post(
-                    LANGSMITH_QUERY_URL, 
-                    headers=self.headers, 
-                    json=payload, 
-                    timeout=REQUEST_TIMEOUT
-                )
+                if body is not None:
+                    resp = self.session.post(
+                        LANGSMITH_QUERY_URL, 
+                        data=body, 
+                        timeout=REQUEST_TIMEOUT
+                    )
+                else:
+                    resp = self.session.post(
+                        LANGSMITH_QUERY_URL, 
+                        json=payload, 
+                        timeout=REQUEST_TIMEOUT
+                    )
                 
                 if resp.status_code == 200:
+                    if orjson is not None:
+                        # Parse the raw body bytes directly, skipping the text decode
+                        return orjson.loads(resp.content)
                     return resp.json()
                 elif resp.status_code == 429:  # Rate limit
                     logging.warning("Rate limit hit (attempt %d/%d), retrying...", attempt + 1, MAX_RETRIES)
                     if attempt < MAX_RETRIES - 1:
+                        time.sleep(_retry_delay(resp.headers.get("Retry-After"), attempt))
                         continue
                 else:
                     # Other HTTP errors
@@ -66,7 +117,8 @@ class LangSmithClient:
                     if attempt < MAX_RETRIES - 1:
                         continue
             
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # ValueError covers malformed bodies from orjson, matching resp.json()
                 logging.warning("Request error (attempt %d/%d): %s", attempt + 1, MAX_RETRIES, str(e))
                 if attempt < MAX_RETRIES - 1:
                     continue
@@ -80,15 +132,15 @@ class LangSmithClient:
                 else:
                     raise RuntimeError(f"LangSmith query failed after {MAX_RETRIES} attempts due to request errors")
     
-    def _create_query_payload(self, start_time: datetime, end_time: datetime, cursor: str = "") -> Dict[str, Any]:
-        """Create the API query payload."""
+    def _create_query_payload(self, start_iso: str, end_iso: str, cursor: str = "") -> Dict[str, Any]:
+        """Create the API query payload from pre-formatted ISO window bounds."""
         return {
             "cursor": cursor,
             "limit": self.config.limit,
             "session": self.config.session_ids,
             "is_root": True,
-            "start_time": _to_iso(start_time),
-            "end_time": _to_iso(end_time),
+            "start_time": start_iso,
+            "end_time": end_iso,
             "order_by": "start_time",
             "select": [
                 "id",
@@ -106,61 +158,92 @@ class LangSmithClient:
         return debug_limit is not None and len(all_runs) >= debug_limit
     
     def _clean_empty_fields(self, run: Dict[str, Any]) -> Dict[str, Any]:
-        """Remove empty fields from a run to reduce JSON size."""
+        """
+        Remove empty fields from a run to reduce JSON size.
+        
+        Nested dictionaries are walked with an explicit stack, and a level is only
+        copied once something in it actually needs to be dropped or replaced.
+        """
         if not isinstance(run, dict):
             return run
         
-        cleaned = {}
-        for key, value in run.items():
-            # Skip empty values (None, empty strings, empty lists, empty dicts)
-            if value is None:
-                continue
-            elif isinstance(value, str) and value.strip() == "":
-                continue
-            elif isinstance(value, (list, dict)) and len(value) == 0:
-                continue
+        # Frames: [source dict, items iterator, copy-on-write result, key in parent]
+        stack: List[List[Any]] = [[run, iter(run.items()), None, None]]
+        while True:
+            frame = stack[-1]
+            for key, value in frame[1]:
+                # Numbers and booleans (the enrichment metrics) are never empty
+                if type(value) in _NEVER_EMPTY_TYPES:
+                    continue
+                # Skip empty values (None, empty strings, empty lists, empty dicts)
+                if (
+                    value is None
+                    or (isinstance(value, str) and value.strip() == "")
+                    or (isinstance(value, (list, dict)) and len(value) == 0)
+                ):
+                    if frame[2] is None:
+                        frame[2] = frame[0].copy()
+                    del frame[2][key]
+                elif isinstance(value, dict):
+                    # Descend into the nested dictionary before continuing this level
+                    stack.append([value, iter(value.items()), None, key])
+                    break
             else:
-                # Recursively clean nested dictionaries
-                if isinstance(value, dict):
-                    cleaned_value = self._clean_empty_fields(value)
-                    if cleaned_value:  # Only add if not empty after cleaning
-                        cleaned[key] = cleaned_value
-                else:
-                    cleaned[key] = value
-        
-        return cleaned
+                stack.pop()
+                source, cleaned = frame[0], frame[2]
+                result = source if cleaned is None else cleaned
+                if not stack:
+                    return result
+                
+                parent = stack[-1]
+                if result is not source or not result:
+                    if parent[2] is None:
+                        parent[2] = parent[0].copy()
+                    if result:
+                        parent[2][frame[3]] = result
+                    else:
+                        # Only add nested dicts that are not empty after cleaning
+                        del parent[2][frame[3]]
     
-    def _deduplicate_incrementally(self, new_runs: List[Dict[str, Any]], existing_runs_by_thread: Dict[str, Dict[str, Any]]) -> int:
+    def _deduplicate_incrementally(
+        self,
+        new_runs: List[Dict[str, Any]],
+        existing_runs_by_thread: Dict[str, Dict[str, Any]],
+        timestamps_by_thread: Dict[str, float],
+    ) -> int:
         """
-        Deduplicate new runs against existing ones, keeping only the latest per thread_id.
-        Updates the existing_runs_by_thread dict in place.
+        Deduplicate new raw runs against existing ones, keeping only the latest per thread_id.
+        Updates the existing_runs_by_thread and timestamps_by_thread dicts in place.
         
         Returns:
             Number of runs that were excluded as duplicates
         """
         duplicates_excluded = 0
         
-        for run in new_runs:
-            thread_id = (run or {}).get("thread_id")
+        # Bind hot lookups to locals for the per-run loop
+        run_get = dict.get
+        parse_iso = _parse_iso
+        get_existing_ts = timestamps_by_thread.get
+        
+        # Drop malformed (non-dict) entries once instead of guarding every lookup
+        for run in [r for r in new_runs if isinstance(r, dict)]:
+            thread_id = run_get(run, "thread_id")
             if not thread_id:
                 # Keep items without thread_id uniquely by id to avoid accidental drops
-                thread_id = f"_no_thread_{(run or {}).get('id', len(existing_runs_by_thread))}"
+                thread_id = f"_no_thread_{run_get(run, 'id', len(existing_runs_by_thread))}"
             
-            ts = _parse_iso((run or {}).get("start_time"))
+            ts = parse_iso(run_get(run, "start_time"))
             
-            existing = existing_runs_by_thread.get(thread_id)
-            if not existing:
-                # Enrich, clean, and store new run
-                enriched_run = enrich_run_with_thread_data(run)
-                cleaned_run = self._clean_empty_fields(enriched_run)
-                existing_runs_by_thread[thread_id] = cleaned_run
+            existing_ts = get_existing_ts(thread_id)
+            if existing_ts is None:
+                # Store new run as-is; enrichment happens once the survivors are known
+                existing_runs_by_thread[thread_id] = run
+                timestamps_by_thread[thread_id] = ts
             else:
-                existing_ts = _parse_iso((existing or {}).get("start_time"))
                 if ts > existing_ts:
                     # Replace with newer run
-                    enriched_run = enrich_run_with_thread_data(run)
-                    cleaned_run = self._clean_empty_fields(enriched_run)
-                    existing_runs_by_thread[thread_id] = cleaned_run
+                    existing_runs_by_thread[thread_id] = run
+                    timestamps_by_thread[thread_id] = ts
                     duplicates_excluded += 1
                 else:
                     # Keep existing, exclude this one
@@ -178,19 +261,40 @@ class LangSmithClient:
             estimation_info,
         )
     
-    def fetch_all_runs(self, start_time: datetime, end_time: datetime, debug_limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Fetch all runs from LangSmith API with pagination and incremental deduplication."""
+    def _fetch_window(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        debug_limit: Optional[int] = None,
+        stop_event: Optional[threading.Event] = None,
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float], int, int]:
+        """
+        Paginate through a single time window with incremental deduplication.
+        
+        If stop_event is set (another shard failed), pagination stops before the
+        next request and the partial result is returned for the caller to discard.
+        
+        Returns:
+            Tuple of (runs_by_thread, timestamps_by_thread, runs_fetched, duplicates_excluded)
+        """
         runs_by_thread: Dict[str, Dict[str, Any]] = {}
+        timestamps_by_thread: Dict[str, float] = {}
         page_index = 0
         cursor = ""
         total_duplicates_excluded = 0
         total_runs_fetched = 0
+        
+        # Only the cursor changes between pages, so build the payload once
+        payload = self._create_query_payload(_to_iso(start_time), _to_iso(end_time))
 
         while True:
+            if stop_event is not None and stop_event.is_set():
+                break
+            
             page_index += 1
             
-            # Create payload and make API request
-            payload = self._create_query_payload(start_time, end_time, cursor)
+            # Update cursor and make API request
+            payload["cursor"] = cursor
             data = self._make_api_request(payload)
             
             # Process response
@@ -201,7 +305,7 @@ class LangSmithClient:
             total_runs_fetched += len(runs)
             
             # Deduplicate incrementally
-            duplicates_excluded = self._deduplicate_incrementally(runs, runs_by_thread)
+            duplicates_excluded = self._deduplicate_incrementally(runs, runs_by_thread, timestamps_by_thread)
             total_duplicates_excluded += duplicates_excluded
 
             # Get next cursor
@@ -226,8 +330,102 @@ class LangSmithClient:
             else:
                 break
 
+        return runs_by_thread, timestamps_by_thread, total_runs_fetched, total_duplicates_excluded
+    
+    def _fetch_sharded(
+        self, start_time: datetime, end_time: datetime, parallel_shards: int
+    ) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
+        """
+        Split the time window into equal slices and paginate them concurrently.
+        
+        Shard results are merged with the same latest-per-thread rule used within a
+        window, so runs seen by two neighbouring slices are only kept once.
+        
+        Returns:
+            Tuple of (runs_by_thread, runs_fetched, duplicates_excluded)
+        """
+        step = (end_time - start_time) / parallel_shards
+        windows = [
+            (start_time + step * i, end_time if i == parallel_shards - 1 else start_time + step * (i + 1))
+            for i in range(parallel_shards)
+        ]
+        
+        results: List[Any] = [None] * parallel_shards
+        stop_event = threading.Event()
+        # Never run more workers than pooled connections, so every request reuses a
+        # kept-alive connection instead of opening (and discarding) an extra one
+        executor = ThreadPoolExecutor(max_workers=min(parallel_shards, CONNECTION_POOL_SIZE))
+        try:
+            futures = {
+                executor.submit(self._fetch_window, shard_start, shard_end, None, stop_event): index
+                for index, (shard_start, shard_end) in enumerate(windows)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        except BaseException:
+            # Abort as soon as one shard fails: queued shards are cancelled, and running
+            # ones stop before their next page request once they see stop_event
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        
+        # Merge shards in chronological order
+        runs_by_thread: Dict[str, Dict[str, Any]] = {}
+        timestamps_by_thread: Dict[str, float] = {}
+        total_runs_fetched = 0
+        total_duplicates_excluded = 0
+        for shard_runs, shard_timestamps, runs_fetched, duplicates_excluded in results:
+            total_runs_fetched += runs_fetched
+            total_duplicates_excluded += duplicates_excluded
+            for thread_id, run in shard_runs.items():
+                ts = shard_timestamps[thread_id]
+                existing_ts = timestamps_by_thread.get(thread_id)
+                if existing_ts is None or ts > existing_ts:
+                    if existing_ts is not None:
+                        total_duplicates_excluded += 1
+                    runs_by_thread[thread_id] = run
+                    timestamps_by_thread[thread_id] = ts
+                else:
+                    total_duplicates_excluded += 1
+        
+        return runs_by_thread, total_runs_fetched, total_duplicates_excluded
+    
+    def fetch_all_runs(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        debug_limit: Optional[int] = None,
+        parallel_shards: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch all runs from LangSmith API with pagination and incremental deduplication.
+        
+        With parallel_shards > 1 (default: config.parallel_shards, i.e. LS_PARALLEL_SHARDS)
+        the time window is split into that many slices that are paginated concurrently.
+        Sharding assumes the start_time/end_time body filters bound each run's start
+        time; the default of 1 fetches the whole window serially. Debug mode always
+        fetches a single window serially so it can stop as soon as the limit is reached.
+        """
+        if parallel_shards is None:
+            parallel_shards = self.config.parallel_shards
+        
+        if debug_limit is not None or parallel_shards <= 1:
+            runs_by_thread, _, total_runs_fetched, total_duplicates_excluded = self._fetch_window(
+                start_time, end_time, debug_limit
+            )
+        else:
+            runs_by_thread, total_runs_fetched, total_duplicates_excluded = self._fetch_sharded(
+                start_time, end_time, parallel_shards
+            )
+
+        # Enrich and clean only the surviving runs, after all network I/O is done
+        final_runs = [
+            self._clean_empty_fields(run)
+            for run in enrich_runs(runs_by_thread.values())
+        ]
+
         # Log final deduplication stats
-        final_runs = list(runs_by_thread.values())
         logging.info("Total runs fetched from API: %s", total_runs_fetched)
         logging.info("Total runs after deduplication: %s", len(final_runs))
         logging.info("Total excluded as older duplicates: %s", total_duplicates_excluded)
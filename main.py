@@ -25,6 +25,7 @@ from __future__ import annotations
 import argparse
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List
 
@@ -40,6 +41,8 @@ from s3_uploader import S3Uploader
 from mongo_uploader import MongoUploader
 from stats_calculator import calculate_export_stats, log_export_stats
 
+VALID_OUTPUT_OPTIONS = frozenset({"json", "s3", "mongo"})
+
 
 def setup_logging(log_level: str) -> None:
     """Configure logging with the specified level."""
@@ -106,23 +109,13 @@ def parse_output_options(output_arg: str) -> tuple[bool, bool]:
     Returns:
         Tuple of (upload_to_s3, upload_to_mongo) booleans
     """
-    options = [opt.strip().lower() for opt in output_arg.split(",")]
-    
-    upload_to_s3 = False
-    upload_to_mongo = False
+    options = {opt.strip().lower() for opt in output_arg.split(",") if opt.strip()}
     
-    for opt in options:
-        if opt == "s3":
-            upload_to_s3 = True
-        elif opt == "mongo":
-            upload_to_mongo = True
-        elif opt == "json":
-            # JSON is always the default format
-            continue
-        else:
-            logging.warning("⚠️ Unknown output option '%s', ignoring", opt)
+    # JSON is always the default format, so it is accepted but sets no flag
+    for opt in sorted(options - VALID_OUTPUT_OPTIONS):
+        logging.warning("⚠️ Unknown output option '%s', ignoring", opt)
     
-    return upload_to_s3, upload_to_mongo
+    return "s3" in options, "mongo" in options
 
 
 def main() -> int:
@@ -169,6 +162,10 @@ def main() -> int:
         client = LangSmithClient(config)
         deduped_runs = client.fetch_all_runs(start_time=start_time, end_time=end_time, debug_limit=debug_limit)
         
+        # Calculate statistics before the MongoDB upload converts the runs into
+        # documents in place, so they never depend on that conversion
+        stats = calculate_export_stats(deduped_runs)
+        
         # Write JSON files (full and summary)
         full_file_path, summary_file_path = write_runs_files(deduped_runs, output_dir=config.output_dir)
         
@@ -176,9 +173,12 @@ def main() -> int:
         if upload_to_s3:
             uploader = S3Uploader(config)
             
-            # Upload both files
-            full_s3_url = uploader.upload_file(full_file_path)
-            summary_s3_url = uploader.upload_file(summary_file_path)
+            # Upload both files concurrently
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                full_future = executor.submit(uploader.upload_file, full_file_path)
+                summary_future = executor.submit(uploader.upload_file, summary_file_path)
+                full_s3_url = full_future.result()
+                summary_s3_url = summary_future.result()
             
             if full_s3_url and summary_s3_url:
                 logging.info("✅ Both files uploaded to S3 successfully.")
@@ -197,8 +197,7 @@ def main() -> int:
                 else:
                     logging.warning("⚠️ MongoDB upload failed, but local files saved.")
         
-        # Calculate and display statistics
-        stats = calculate_export_stats(deduped_runs)
+        # Display statistics
         log_export_stats(stats)
         
         logging.info("✅ Export completed successfully.")
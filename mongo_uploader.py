@@ -2,16 +2,56 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from config import Config
+from datetime_utils import parse_iso_datetime
 
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except ImportError:  # pragma: no cover
     from backports.zoneinfo import ZoneInfo  # type: ignore
 
+try:
+    import pymongo  # type: ignore
+    from pymongo import ReplaceOne  # type: ignore
+    from pymongo.errors import BulkWriteError  # type: ignore
+except ImportError:  # pragma: no cover
+    pymongo = None  # type: ignore
+
+_UTC = ZoneInfo("UTC")
+
+# Number of upserts sent per bulk_write round-trip
+BULK_WRITE_BATCH_SIZE = 1000
+
+# Number of bulk_write batches allowed in flight at once
+BULK_WRITE_WORKERS = 4
+
+# Name MongoDB gives the ascending unique index on thread_id
+THREAD_ID_INDEX_NAME = "thread_id_1"
+
+# Fields stored as BSON Date instead of ISO strings
+DATETIME_FIELDS = (
+    "mongo_updated_at",
+    "mongo_created_at",
+    "first_msg_time",
+    "last_msg_time",
+    "start_time",
+    "end_time",
+)
+
+
+def _ensure_datetime(value: Any) -> Optional[datetime]:
+    """Convert an ISO 8601 string to an aware datetime; pass datetimes through, else None."""
+    if isinstance(value, datetime):
+        return value
+    dt = parse_iso_datetime(value)
+    if dt is not None and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_UTC)
+    return dt
+
 
 class MongoUploader:
     """Handles uploading conversations to MongoDB."""
@@ -41,9 +81,7 @@ class MongoUploader:
             logging.error("MONGO_COLLECTION_NAME environment variable is required for MongoDB upload.")
             return False
         
-        try:
-            import pymongo  # type: ignore
-        except ImportError:
+        if pymongo is None:
             logging.error("pymongo not installed. Install with: pip install pymongo")
             return False
         
@@ -55,9 +93,6 @@ class MongoUploader:
             self.db = self.client[self.config.mongo_database_name]
             self.collection = self.db[self.config.mongo_collection_name]
             
-            # Create unique index on thread_id if it doesn't exist
-            self.collection.create_index("thread_id", unique=True)
-            
             logging.info("Connected to MongoDB successfully")
             return True
             
@@ -65,12 +100,26 @@ class MongoUploader:
             logging.error("❌ Failed to connect to MongoDB: %s", e)
             return False
     
+    def ensure_thread_id_index(self) -> None:
+        """Create the unique thread_id index only if the collection does not have it yet."""
+        try:
+            existing = {index["name"] for index in self.collection.list_indexes()}
+            if THREAD_ID_INDEX_NAME not in existing:
+                self.collection.create_index("thread_id", unique=True)
+                logging.info("Created unique index on thread_id")
+        except Exception as e:
+            logging.warning("⚠️ Could not verify thread_id index: %s", e)
+    
     def upload_conversations(self, runs: List[Dict[str, Any]]) -> Dict[str, int]:
         """
         Upload conversations to MongoDB with upsert behavior.
         
+        The runs are modified in place: mongo_updated_at/mongo_created_at are added
+        and start_time, end_time, first_msg_time and last_msg_time become datetime
+        objects. Write any JSON exports of the runs before calling this.
+        
         Args:
-            runs: List of processed runs with conversation data
+            runs: List of processed runs with conversation data (mutated in place)
             
         Returns:
             Dictionary with counts: {"inserted": int, "updated": int, "errors": int}
@@ -78,97 +127,120 @@ class MongoUploader:
         if not self.connect():
             return {"inserted": 0, "updated": 0, "errors": 0}
         
+        if self.config.mongo_ensure_index:
+            self.ensure_thread_id_index()
+        
         stats = {"inserted": 0, "updated": 0, "errors": 0}
         # Use a datetime object so MongoDB stores as Date type
-        current_time = datetime.now(ZoneInfo("UTC"))
+        current_time = datetime.now(_UTC)
+        operations: List[Any] = []
+        batch_futures: List[Future] = []
         
-        for run in runs:
-            if not isinstance(run, dict):
-                stats["errors"] += 1
-                continue
+        # Batches are independent (thread_id is the key), so several bulk_writes can be
+        # in flight at once over the client's shared, thread-safe connection pool
+        with ThreadPoolExecutor(max_workers=BULK_WRITE_WORKERS) as executor:
+            for run in runs:
+                if not isinstance(run, dict):
+                    stats["errors"] += 1
+                    continue
             
-            thread_id = run.get("thread_id")
-            if not thread_id:
-                logging.warning("Skipping run without thread_id")
-                stats["errors"] += 1
-                continue
+                thread_id = run.get("thread_id")
+                if not thread_id:
+                    logging.warning("Skipping run without thread_id")
+                    stats["errors"] += 1
+                    continue
+            
+                try:
+                    # Prepare document for MongoDB
+                    mongo_doc = self._prepare_document(run, current_time)
+                except Exception as e:
+                    logging.error("Failed to prepare conversation %s: %s", thread_id, e)
+                    stats["errors"] += 1
+                    continue
             
-            try:
-                # Prepare document for MongoDB
-                mongo_doc = self._prepare_document(run, current_time)
-                
                 # Use upsert to insert or update based on thread_id
-                result = self.collection.replace_one(
-                    {"thread_id": thread_id},
-                    mongo_doc,
-                    upsert=True
-                )
-                
-                if result.upserted_id:
-                    stats["inserted"] += 1
-                    logging.debug("Inserted new conversation: %s", thread_id)
-                else:
-                    stats["updated"] += 1
-                    logging.debug("Updated existing conversation: %s", thread_id)
-                    
-            except Exception as e:
-                logging.error("Failed to upload conversation %s: %s", thread_id, e)
-                stats["errors"] += 1
+                operations.append(ReplaceOne({"thread_id": thread_id}, mongo_doc, upsert=True))
+                if len(operations) >= BULK_WRITE_BATCH_SIZE:
+                    batch_futures.append(executor.submit(self._flush_batch, operations))
+                    operations = []
+            
+            if operations:
+                batch_futures.append(executor.submit(self._flush_batch, operations))
+        
+        for future in batch_futures:
+            for key, count in future.result().items():
+                stats[key] += count
         
         self._log_upload_stats(stats)
         return stats
     
+    def _flush_batch(self, operations: List[Any]) -> Dict[str, int]:
+        """
+        Submit a batch of upserts in a single unordered bulk_write.
+        
+        Partial failures are harvested from BulkWriteError so one bad document does
+        not discard the rest of the batch.
+        
+        Returns:
+            Dictionary with this batch's counts: {"inserted": int, "updated": int, "errors": int}
+        """
+        batch_stats = {"inserted": 0, "updated": 0, "errors": 0}
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            batch_stats["inserted"] += result.upserted_count
+            batch_stats["updated"] += result.matched_count
+        except BulkWriteError as e:
+            details = e.details or {}
+            write_errors = details.get("writeErrors", [])
+            batch_stats["inserted"] += details.get("nUpserted", 0)
+            batch_stats["updated"] += details.get("nMatched", 0)
+            batch_stats["errors"] += len(write_errors)
+            for error in write_errors:
+                # The failed operation's filter ("q") carries the thread_id it upserts
+                thread_id = (error.get("op") or {}).get("q", {}).get("thread_id")
+                logging.error("Failed to upload conversation %s: %s", thread_id, error.get("errmsg"))
+        except Exception as e:
+            logging.error("Failed to upload batch of %d conversations: %s", len(operations), e)
+            batch_stats["errors"] += len(operations)
+            return batch_stats
+        
+        logging.debug("Flushed batch of %d conversations to MongoDB", len(operations))
+        return batch_stats
+    
     def _prepare_document(self, run: Dict[str, Any], current_time: datetime) -> Dict[str, Any]:
         """
         Prepare a run document for MongoDB storage.
         
+        The run is converted in place (no copy), so callers must be done with its
+        JSON-friendly form, e.g. after the export files have been written.
+        
         Args:
             run: Run data from LangSmith
             current_time: Current timestamp for tracking updates
             
         Returns:
-            Document ready for MongoDB insertion
+            Document ready for MongoDB insertion (the same dict as run)
         """
-        # Create a copy and add MongoDB metadata
-        doc = run.copy()
+        # Add MongoDB metadata directly to the run
+        doc = run
         
         # Add MongoDB-specific fields (as datetime objects)
         doc["mongo_updated_at"] = current_time
         doc["mongo_created_at"] = doc.get("mongo_created_at", current_time)  # Preserve original creation time
 
         # Convert known timestamp fields to datetime so Mongo stores them as Date type
-        def _ensure_datetime(value: Any) -> Optional[datetime]:
-            if isinstance(value, datetime):
-                return value
-            if isinstance(value, str) and value:
-                try:
-                    # Support trailing Z and timezone info
-                    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                    if dt.tzinfo is None:
-                        try:
-                            dt = dt.replace(tzinfo=ZoneInfo("UTC"))
-                        except Exception:
-                            pass
-                    return dt
-                except Exception:
-                    return None
-            return None
-
-        for field_name in [
-            "mongo_updated_at",
-            "mongo_created_at",
-            "first_msg_time",
-            "last_msg_time",
-            "start_time",
-            "end_time",
-        ]:
-            if field_name in doc and doc[field_name] is not None:
-                converted = _ensure_datetime(doc[field_name])
-                if converted is not None:
-                    doc[field_name] = converted
+        for field_name in DATETIME_FIELDS:
+            value = doc.get(field_name)
+            # Missing fields and values that are already datetimes need no work
+            if value is None or isinstance(value, datetime):
+                continue
+            converted = _ensure_datetime(value)
+            if converted is not None:
+                doc[field_name] = converted
         
         # Ensure thread_id is present and clean
-        doc["thread_id"] = str(doc.get("thread_id", ""))
+        if not isinstance(doc.get("thread_id"), str):
+            doc["thread_id"] = str(doc.get("thread_id", ""))
         
         return doc
     
@@ -3,16 +3,60 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Optional
+import threading
+from typing import Any, Optional
+
+try:
+    import boto3  # type: ignore
+    from boto3.s3.transfer import TransferConfig  # type: ignore
+    from botocore.config import Config as BotoConfig  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+except ImportError:  # pragma: no cover
+    boto3 = None  # type: ignore
 
 from config import Config
 
+# Multipart transfer tuning for large export files
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 64 * 1024 * 1024
+MAX_TRANSFER_CONCURRENCY = 16
+
+# Connection pool must cover concurrent transfer threads across simultaneous uploads
+MAX_POOL_CONNECTIONS = 32
+
+_TRANSFER_CONFIG = (
+    TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=MAX_TRANSFER_CONCURRENCY,
+        use_threads=True,
+    )
+    if boto3 is not None
+    else None
+)
+
 
 class S3Uploader:
     """Handles uploading files to AWS S3."""
     
     def __init__(self, config: Config):
         self.config = config
+        self._s3_client: Any = None
+        self._client_lock = threading.Lock()
+    
+    def _get_client(self) -> Any:
+        """Create the S3 client on first use and reuse it (clients are thread-safe)."""
+        with self._client_lock:
+            if self._s3_client is None:
+                self._s3_client = boto3.client(
+                    "s3",
+                    region_name=self.config.aws_region,
+                    config=BotoConfig(
+                        max_pool_connections=MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 10, "mode": "adaptive"},
+                    ),
+                )
+            return self._s3_client
     
     def upload_file(self, file_path: str) -> Optional[str]:
         """
@@ -28,18 +72,17 @@ class S3Uploader:
             logging.info("No S3 bucket configured. File saved locally only.")
             return None
         
-        try:
-            import boto3  # type: ignore
-            from botocore.exceptions import ClientError  # type: ignore
-        except ImportError:
+        if boto3 is None:
             logging.error("boto3 not installed. Install with: pip install boto3")
             return None
 
         try:
-            s3_client = boto3.client("s3", region_name=self.config.aws_region)
+            s3_client = self._get_client()
             file_name = os.path.basename(file_path)
             
-            s3_client.upload_file(file_path, self.config.s3_bucket_name, file_name)
+            s3_client.upload_file(
+                file_path, self.config.s3_bucket_name, file_name, Config=_TRANSFER_CONFIG
+            )
             s3_url = f"s3://{self.config.s3_bucket_name}/{file_name}"
             logging.info("Uploaded to S3: %s", s3_url)
             return s3_url
@@ -26,28 +26,20 @@ def calculate_export_stats(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
             "lesson_ids": set(),
         }
     
-    thread_ids: Set[str] = set()
-    user_ids: Set[str] = set()
-    lesson_ids: Set[str] = set()
+    # Filter once, then let set comprehensions do the per-run work
+    dict_runs = [run for run in runs if isinstance(run, dict)]
     
-    for run in runs:
-        if not isinstance(run, dict):
-            continue
-            
-        # Count unique thread_ids (conversations)
-        thread_id = run.get("thread_id")
-        if thread_id:
-            thread_ids.add(str(thread_id))
-        
-        # Count unique user_ids (parsed from thread_id)
-        user_id = run.get("user_id")
-        if user_id:
-            user_ids.add(str(user_id))
-            
-        # Count unique lesson_ids (parsed from thread_id)
-        lesson_id = run.get("lesson_id")
-        if lesson_id:
-            lesson_ids.add(str(lesson_id))
+    # Count unique thread_ids (conversations); LangSmith returns them as strings,
+    # so only cast the unexpected ones
+    thread_ids: Set[str] = {
+        thread_id if isinstance(thread_id, str) else str(thread_id)
+        for thread_id in (run.get("thread_id") for run in dict_runs)
+        if thread_id
+    }
+    
+    # Count unique user_ids and lesson_ids (parse_thread_id already returns str or None)
+    user_ids: Set[str] = {run["user_id"] for run in dict_runs if run.get("user_id")}
+    lesson_ids: Set[str] = {run["lesson_id"] for run in dict_runs if run.get("lesson_id")}
     
     stats = {
         "total_runs": len(runs),
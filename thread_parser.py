@@ -2,8 +2,46 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional, Tuple, Dict, Any, List
-from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple, Dict, Any, List, Iterable
+from datetime import datetime, timezone
+
+from datetime_utils import parse_iso_datetime
+
+# (scale, unit) for the "+Ns/m/h" gap suffix, indexed by (t >= 60) + (t >= 3600)
+_TIME_SUFFIX_UNITS = ((1, "s"), (60, "m"), (3600, "h"))
+
+# (scale, unit) applied to the duration in hours, indexed by (hours >= 1)
+_DURATION_UNITS = ((60, "minutes"), (1, "hours"))
+
+# Roles for the LangChain message types seen in practice
+_ROLE_BY_TYPE = {
+    "SystemMessage": "system",
+    "HumanMessage": "user",
+    "AIMessage": "assistant",
+    "AIMessageChunk": "assistant",
+    "ToolMessage": "assistant",
+    "FunctionMessage": "assistant",
+}
+
+
+@lru_cache(maxsize=1 << 16)
+def _split_thread_id(thread_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split thread_id at its last hyphen into stripped (user_id, lesson_id), or (None, None)."""
+    # Split by the last hyphen to handle user IDs that might contain hyphens
+    split_at = thread_id.rfind("-")
+    if split_at < 0:
+        return None, None
+    
+    user_id = thread_id[:split_at]
+    lesson_id = thread_id[split_at + 1:]
+    
+    # Basic validation
+    if not user_id or not lesson_id:
+        return None, None
+    
+    # str.strip() hands back the same object when there is nothing to strip
+    return user_id.strip(), lesson_id.strip()
 
 
 def parse_thread_id(thread_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
@@ -21,45 +59,28 @@ def parse_thread_id(thread_id: Optional[str]) -> Tuple[Optional[str], Optional[s
     if not thread_id or not isinstance(thread_id, str):
         return None, None
     
-    # Split by the last hyphen to handle user IDs that might contain hyphens
-    parts = thread_id.rsplit("-", 1)
-    
-    if len(parts) != 2:
-        logging.debug("🔍 Could not parse thread_id '%s' - expected format: user-id-lesson-id", thread_id)
-        return None, None
-    
-    user_id, lesson_id = parts
+    user_id, lesson_id = _split_thread_id(thread_id)
     
-    # Basic validation
-    if not user_id or not lesson_id:
-        logging.debug("🔍 Invalid thread_id parts in '%s' - user_id: '%s', lesson_id: '%s'", 
-                     thread_id, user_id, lesson_id)
-        return None, None
-    
-    return user_id.strip(), lesson_id.strip()
-
-
-def _get_nested_value(obj: Dict[str, Any], path: List[str]) -> Any:
-    """Safely get nested value from dictionary."""
-    current = obj
-    for key in path:
-        if isinstance(current, dict) and key in current:
-            current = current[key]
+    # Log outside the cached split so every failing call is still reported, but
+    # skip building the message parts entirely unless debug logging is on
+    if user_id is None and logging.getLogger().isEnabledFor(logging.DEBUG):
+        if "-" not in thread_id:
+            logging.debug("🔍 Could not parse thread_id '%s' - expected format: user-id-lesson-id", thread_id)
         else:
-            return None
-    return current
-
-
-def _pick_first_valid(*values) -> Any:
-    """Return the first non-None, non-empty value."""
-    for value in values:
-        if value is not None and value != "":
-            return value
-    return None
+            user_part, _, lesson_part = thread_id.rpartition("-")
+            logging.debug("🔍 Invalid thread_id parts in '%s' - user_id: '%s', lesson_id: '%s'", 
+                         thread_id, user_part, lesson_part)
+    
+    return user_id, lesson_id
 
 
 def _role_from_type(message_type: str) -> str:
     """Convert LangChain message type to role."""
+    role = _ROLE_BY_TYPE.get(message_type)
+    if role is not None:
+        return role
+    
+    # Qualified or custom type names fall back to suffix matching
     if not message_type:
         return "assistant"
     if message_type.endswith("SystemMessage"):
@@ -69,56 +90,109 @@ def _role_from_type(message_type: str) -> str:
     return "assistant"  # AIMessage / AIMessageChunk
 
 
-def _extract_content(message: Dict[str, Any]) -> str:
-    """Extract content from message object."""
-    content = _pick_first_valid(
-        _get_nested_value(message, ["kwargs", "content"]),
-        _get_nested_value(message, ["kwargs", "lc_kwargs", "lc_kwargs", "content"]),
-        _get_nested_value(message, ["content"])
-    )
+def _extract_content(message: Dict[str, Any], kwargs: Dict[str, Any]) -> str:
+    """Extract content from message object (kwargs is its "kwargs" dict, or empty)."""
+    # First non-None, non-empty candidate wins
+    content = kwargs.get("content")
+    if content is None or content == "":
+        lc_kwargs = kwargs.get("lc_kwargs")
+        if isinstance(lc_kwargs, dict):
+            lc_kwargs = lc_kwargs.get("lc_kwargs")
+        content = lc_kwargs.get("content") if isinstance(lc_kwargs, dict) else None
+        if content is None or content == "":
+            content = message.get("content")
     return str(content or "")
 
 
-def _extract_timestamp(message: Dict[str, Any]) -> Optional[str]:
-    """Extract timestamp from message object."""
-    return _pick_first_valid(
-        _get_nested_value(message, ["kwargs", "additional_kwargs", "timestamp"]),
-        _get_nested_value(message, ["additional_kwargs", "timestamp"])
-    )
+def _extract_timestamp(message: Dict[str, Any], kwargs: Dict[str, Any]) -> Optional[str]:
+    """Extract timestamp from message object (kwargs is its "kwargs" dict, or empty)."""
+    # First non-None, non-empty candidate wins
+    extra = kwargs.get("additional_kwargs")
+    timestamp = extra.get("timestamp") if isinstance(extra, dict) else None
+    if timestamp is None or timestamp == "":
+        extra = message.get("additional_kwargs")
+        timestamp = extra.get("timestamp") if isinstance(extra, dict) else None
+        if timestamp == "":
+            return None
+    return timestamp
 
 
-def _simplify_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Convert complex LangChain messages to simplified format with timing."""
-    if not isinstance(messages, list):
-        return []
+def _empty_conversation_metrics() -> Dict[str, Any]:
+    """Conversation metrics for a run without a usable message list."""
+    return {
+        "message_count": 0,
+        "user_messages": 0,
+        "assistant_messages": 0,
+        "system_messages": 0,
+        "first_msg_time": None,
+        "last_msg_time": None,
+        "total_time_minutes": None,
+        "time_since_last_message_minutes": None
+    }
+
+
+def _process_messages(
+    messages: List[Dict[str, Any]],
+    now: Optional[datetime] = None
+) -> Tuple[List[Dict[str, Any]], List[datetime], Dict[str, int], Dict[str, Any]]:
+    """
+    Analyze and simplify conversation messages in a single pass.
+    
+    Role counts and first/last times cover every message, while the simplified
+    format (and its sender counts) only keeps messages with content and a
+    valid timestamp.
+    
+    Args:
+        messages: Non-empty list of original LangChain messages from the run outputs
+        now: Timezone-aware current time for time_since_last_message_minutes
+            (defaults to the current UTC time)
+        
+    Returns:
+        Tuple of (simplified messages, parsed datetime of each simplified message,
+        sender counts of the simplified messages, conversation metrics)
+    """
+    role_counts = {"user": 0, "assistant": 0, "system": 0}
+    sender_counts = {"user": 0, "assistant": 0, "system": 0}
+    first_dt = None
+    last_dt = None
     
     simplified_messages = []
+    message_times = []
     previous_timestamp = None
     
     for message in messages:
         if not isinstance(message, dict):
             continue
         
+        kwargs = message.get("kwargs")
+        if not isinstance(kwargs, dict):
+            kwargs = {}
+        
         # Extract message type and role
-        message_id = message.get("id") or _get_nested_value(message, ["kwargs", "id"]) or []
+        message_id = message.get("id") or kwargs.get("id") or []
         type_name = message_id[-1] if isinstance(message_id, list) and message_id else str(message_id or "")
         sender = _role_from_type(type_name)
+        role_counts[sender] += 1
+        
+        # Track first/last timestamps across all messages
+        current_timestamp = parse_iso_datetime(_extract_timestamp(message, kwargs))
+        if current_timestamp is None:
+            continue  # Skip messages without valid timestamps
+        
+        try:
+            if first_dt is None or current_timestamp < first_dt:
+                first_dt = current_timestamp
+            if last_dt is None or current_timestamp > last_dt:
+                last_dt = current_timestamp
+        except TypeError:
+            pass
         
         # Extract content
-        content = _extract_content(message)
+        content = _extract_content(message, kwargs)
         if not content:
             continue  # Skip empty messages
         
-        # Extract timestamp
-        timestamp_str = _extract_timestamp(message)
-        if not timestamp_str:
-            continue  # Skip messages without timestamps
-        
-        # Parse timestamp and calculate time since previous
         try:
-            current_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            iso_time = current_timestamp.isoformat()
-            
             # Calculate time since previous message
             time_since_previous_seconds = None
             if previous_timestamp:
@@ -126,23 +200,52 @@ def _simplify_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
                 time_since_previous_seconds = round(time_diff, 3)
             
             simplified_messages.append({
-                "timestamp": iso_time,
+                "timestamp": current_timestamp.isoformat(),
                 "sender": sender,
                 "message": content,
                 "time_since_previous_seconds": time_since_previous_seconds
             })
             
+            message_times.append(current_timestamp)
+            sender_counts[sender] += 1
             previous_timestamp = current_timestamp
             
-        except (ValueError, TypeError):
-            continue  # Skip messages with invalid timestamps
+        except TypeError:
+            continue  # Skip messages mixing naive and aware timestamps
     
-    return simplified_messages
+    # first_dt and last_dt are set together, and every tracked time compared
+    # cleanly against them, so the subtractions below cannot mix naive and aware
+    total_time_minutes = None
+    time_since_last_message_minutes = None
+    if last_dt is not None:
+        # Calculate duration
+        total_time_minutes = (last_dt - first_dt).total_seconds() / 60
+        
+        # Calculate time since last message
+        # Naive message times are read as local time when converted to UTC
+        if now is None:
+            now = datetime.now(timezone.utc)
+        time_since_last_message_minutes = (now - last_dt.astimezone(timezone.utc)).total_seconds() / 60
+    
+    metrics = {
+        "message_count": len(messages),
+        "user_messages": role_counts["user"],
+        "assistant_messages": role_counts["assistant"],
+        "system_messages": role_counts["system"],
+        "first_msg_time": first_dt.isoformat() if first_dt is not None else None,
+        "last_msg_time": last_dt.isoformat() if last_dt is not None else None,
+        "total_time_minutes": total_time_minutes,
+        "time_since_last_message_minutes": time_since_last_message_minutes
+    }
+    
+    return simplified_messages, message_times, sender_counts, metrics
 
 
 def _format_conversation_string(
     run: Dict[str, Any], 
-    simplified_messages: List[Dict[str, Any]]
+    simplified_messages: List[Dict[str, Any]],
+    message_times: List[datetime],
+    sender_counts: Dict[str, int]
 ) -> str:
     """
     Generate a human-readable conversation string from simplified messages.
@@ -150,6 +253,8 @@ def _format_conversation_string(
     Args:
         run: The original run data
         simplified_messages: List of simplified message objects
+        message_times: Parsed datetime of each simplified message
+        sender_counts: Number of simplified messages per sender
         
     Returns:
         Formatted conversation string
@@ -164,25 +269,19 @@ def _format_conversation_string(
     
     # Calculate conversation stats
     total_messages = len(simplified_messages)
-    user_count = sum(1 for msg in simplified_messages if msg.get("sender") == "user")
-    assistant_count = sum(1 for msg in simplified_messages if msg.get("sender") == "assistant")
-    system_count = sum(1 for msg in simplified_messages if msg.get("sender") == "system")
+    user_count = sender_counts.get("user", 0)
+    assistant_count = sender_counts.get("assistant", 0)
+    system_count = sender_counts.get("system", 0)
     
     # Calculate duration
-    first_time = simplified_messages[0].get("timestamp")
-    last_time = simplified_messages[-1].get("timestamp")
     duration_str = "unknown"
     
-    if first_time and last_time and len(simplified_messages) > 1:
+    if len(simplified_messages) > 1:
         try:
-            first_dt = datetime.fromisoformat(first_time.replace('Z', '+00:00'))
-            last_dt = datetime.fromisoformat(last_time.replace('Z', '+00:00'))
-            duration_hours = (last_dt - first_dt).total_seconds() / 3600
-            if duration_hours < 1:
-                duration_str = f"{duration_hours * 60:.1f} minutes"
-            else:
-                duration_str = f"{duration_hours:.1f} hours"
-        except (ValueError, TypeError):
+            duration_hours = (message_times[-1] - message_times[0]).total_seconds() / 3600
+            scale, unit = _DURATION_UNITS[duration_hours >= 1]
+            duration_str = f"{duration_hours * scale:.1f} {unit}"
+        except TypeError:
             duration_str = "unknown"
     
     # Build header
@@ -194,36 +293,26 @@ def _format_conversation_string(
         ""
     ]
     
-    # Format each message
-    for msg in simplified_messages:
-        timestamp_str = msg.get("timestamp", "")
-        sender = msg.get("sender", "unknown").upper()
-        message_content = msg.get("message", "")
-        time_since_previous = msg.get("time_since_previous_seconds")
+    # Format each message (method lookups bound once outside the loop)
+    append = lines.append
+    suffix_units = _TIME_SUFFIX_UNITS
+    for msg, dt in zip(simplified_messages, message_times):
+        get = msg.get
+        sender = get("sender", "unknown").upper()
+        message_content = get("message", "")
+        time_since_previous = get("time_since_previous_seconds")
         
         # Format timestamp for display (remove timezone info for cleaner look)
-        display_time = "unknown"
-        if timestamp_str:
-            try:
-                dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                display_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except (ValueError, TypeError):
-                display_time = timestamp_str
+        display_time = dt.strftime("%Y-%m-%d %H:%M:%S")
         
         # Format time since previous
         time_suffix = ""
         if time_since_previous is not None:
-            if time_since_previous < 60:
-                time_suffix = f" (+{time_since_previous:.1f}s)"
-            elif time_since_previous < 3600:
-                time_suffix = f" (+{time_since_previous/60:.1f}m)"
-            else:
-                time_suffix = f" (+{time_since_previous/3600:.1f}h)"
+            scale, unit = suffix_units[(time_since_previous >= 60) + (time_since_previous >= 3600)]
+            time_suffix = f" (+{time_since_previous / scale:.1f}{unit})"
         
-        # Add message
-        lines.append(f"[{display_time}] {sender}{time_suffix}:")
-        lines.append(message_content)
-        lines.append("")  # Empty line between messages
+        # Add message as one block; the join supplies the blank line between messages
+        append(f"[{display_time}] {sender}{time_suffix}:\n{message_content}\n")
     
     # Add footer
     lines.append("=== END CONVERSATION ===")
@@ -231,99 +320,28 @@ def _format_conversation_string(
     return "\n".join(lines)
 
 
-def _analyze_conversation(run: Dict[str, Any]) -> Dict[str, Any]:
-    """Analyze conversation messages and extract metrics."""
-    messages = _get_nested_value(run, ["outputs", "messages"]) or []
-    
-    if not isinstance(messages, list):
-        return {
-            "message_count": 0,
-            "user_messages": 0,
-            "assistant_messages": 0,
-            "system_messages": 0,
-            "first_msg_time": None,
-            "last_msg_time": None,
-            "total_time_minutes": None,
-            "time_since_last_message_minutes": None
-        }
-    
-    count_user = 0
-    count_assistant = 0
-    count_system = 0
-    first_msg_time = None
-    last_msg_time = None
-    
-    for message in messages:
-        if not isinstance(message, dict):
-            continue
-            
-        # Determine role
-        message_id = message.get("id") or _get_nested_value(message, ["kwargs", "id"]) or []
-        type_name = message_id[-1] if isinstance(message_id, list) and message_id else str(message_id or "")
-        role = _role_from_type(type_name)
-        
-        # Count by role
-        if role == "user":
-            count_user += 1
-        elif role == "assistant":
-            count_assistant += 1
-        elif role == "system":
-            count_system += 1
-        
-        # Track timestamps
-        timestamp = _extract_timestamp(message)
-        if timestamp:
-            try:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                iso_time = dt.isoformat()
-                
-                if not first_msg_time or dt < datetime.fromisoformat(first_msg_time.replace('Z', '+00:00')):
-                    first_msg_time = iso_time
-                if not last_msg_time or dt > datetime.fromisoformat(last_msg_time.replace('Z', '+00:00')):
-                    last_msg_time = iso_time
-            except (ValueError, TypeError):
-                continue
-    
-    # Calculate duration
-    total_time_minutes = None
-    if first_msg_time and last_msg_time:
-        try:
-            first_dt = datetime.fromisoformat(first_msg_time.replace('Z', '+00:00'))
-            last_dt = datetime.fromisoformat(last_msg_time.replace('Z', '+00:00'))
-            total_ms = (last_dt - first_dt).total_seconds() * 1000
-            total_time_minutes = total_ms / 1000 / 60
-        except (ValueError, TypeError):
-            pass
-    
-    # Calculate time since last message
-    time_since_last_message_minutes = None
-    if last_msg_time:
-        try:
-            last_dt = datetime.fromisoformat(last_msg_time.replace('Z', '+00:00'))
-            now = datetime.now(last_dt.tzinfo)
-            time_since_last_message_minutes = (now - last_dt).total_seconds() / 60
-        except (ValueError, TypeError):
-            pass
-    
-    return {
-        "message_count": len(messages),
-        "user_messages": count_user,
-        "assistant_messages": count_assistant,
-        "system_messages": count_system,
-        "first_msg_time": first_msg_time,
-        "last_msg_time": last_msg_time,
-        "total_time_minutes": total_time_minutes,
-        "time_since_last_message_minutes": time_since_last_message_minutes
-    }
-
-
-def enrich_run_with_thread_data(run: dict) -> dict:
+def enrich_run_with_thread_data(
+    run: dict,
+    *,
+    copy: bool = False,
+    include_conversation_str: bool = True,
+    now: Optional[datetime] = None
+) -> dict:
     """
     Enrich a run dictionary with parsed user_id, lesson_id from thread_id,
     conversation analysis metrics, and simplified message format.
     
+    The run is updated in place and returned by default. With copy=True a
+    shallow copy is enriched instead; it shares outputs (and its messages)
+    with the original rather than duplicating them.
+    
     Args:
         run: Run dictionary from LangSmith API
+        copy: Enrich a shallow copy instead of mutating run in place
+        include_conversation_str: Build the human-readable conversation_str; callers
+            that only consume conversation_json and the metrics can skip it
+        now: Timezone-aware current time for time_since_last_message_minutes; batch
+            callers pass one shared value (defaults to the current UTC time)
         
     Returns:
         Enhanced run dictionary with user_id, lesson_id, conversation metrics, and simplified outputs
@@ -331,8 +349,8 @@ def enrich_run_with_thread_data(run: dict) -> dict:
     if not isinstance(run, dict):
         return run
     
-    # Create a copy to avoid modifying the original
-    enriched_run = run.copy()
+    # Mutate in place unless the caller still needs the original untouched
+    enriched_run = run.copy() if copy else run
     
     # Parse thread_id
     thread_id = run.get("thread_id")
@@ -340,13 +358,17 @@ def enrich_run_with_thread_data(run: dict) -> dict:
     enriched_run["user_id"] = user_id
     enriched_run["lesson_id"] = lesson_id
     
-    # Analyze conversation
-    conversation_metrics = _analyze_conversation(run)
-    enriched_run.update(conversation_metrics)
+    outputs = run.get("outputs")
+    original_messages = outputs.get("messages") if isinstance(outputs, dict) else None
     
-    # Process messages for simplified format
-    original_messages = _get_nested_value(run, ["outputs", "messages"]) or []
-    simplified_messages = _simplify_messages(original_messages)
+    # Runs without messages (e.g. partial or failed runs) only get empty metrics
+    if not original_messages or not isinstance(original_messages, list):
+        enriched_run.update(_empty_conversation_metrics())
+        return enriched_run
+    
+    # Analyze conversation and build the simplified format in one pass
+    simplified_messages, message_times, sender_counts, conversation_metrics = _process_messages(original_messages, now)
+    enriched_run.update(conversation_metrics)
     
     # Add simplified conversation format and conversation string
     if simplified_messages:
@@ -354,9 +376,32 @@ def enrich_run_with_thread_data(run: dict) -> dict:
             "messages": simplified_messages
         }
         # Add human-readable conversation string
-        enriched_run["conversation_str"] = _format_conversation_string(enriched_run, simplified_messages)
+        if include_conversation_str:
+            enriched_run["conversation_str"] = _format_conversation_string(
+                enriched_run, simplified_messages, message_times, sender_counts
+            )
         
         # Keep original outputs intact (will be preserved in MongoDB)
         # For JSON files, we'll remove outputs in file_manager.py based on file type
     
     return enriched_run
+
+
+def enrich_runs(runs: Iterable[dict], *, include_conversation_str: bool = True) -> List[dict]:
+    """
+    Enrich a batch of runs in place with enrich_run_with_thread_data.
+    
+    The current time is read once and shared by every run in the batch.
+    
+    Args:
+        runs: Run dictionaries from LangSmith API
+        include_conversation_str: Build the human-readable conversation_str for each run
+        
+    Returns:
+        List of the enriched runs, in input order
+    """
+    now = datetime.now(timezone.utc)
+    return [
+        enrich_run_with_thread_data(run, include_conversation_str=include_conversation_str, now=now)
+        for run in runs
+    ]